@@ -5,7 +5,8 @@ import sys
 import os
 import logging
 import time
-from typing import Set, Tuple, Dict, List, Optional
+import threading
+from typing import Set, FrozenSet, Tuple, Dict, List, Optional
 from stat import S_ISREG, S_ISBLK
 from PyQt5 import QtWidgets, QtGui, QtCore
 from PyQt5.QtCore import Qt, QPoint
@@ -28,6 +29,16 @@ GREY: Final = QtGui.QColor(200, 200, 200)
 WHITE: Final = QtGui.QColor(255, 255, 255)
 YELLOW: Final = QtGui.QColor(0xff, 0xff, 0xdd)  # light yellow
 
+# Table columns with something special about them
+COL_COMMAND: Final = 6
+COL_FILE_NAME: Final = 7
+
+# Text alignment of each table column, precomputed so filling in a row
+# needn't build the flags cell by cell
+ALIGN_CENTER: Final = int(Qt.AlignCenter)
+ALIGN_LEFT: Final = int(Qt.AlignLeft | Qt.AlignVCenter)
+COLUMN_ALIGNMENT: Final = (ALIGN_CENTER,) * COL_FILE_NAME + (ALIGN_LEFT,)
+
 # How often to check for changed proc files
 UPDATE_MSEC: Final = 2000
 
@@ -35,95 +46,231 @@ UPDATE_MSEC: Final = 2000
 # changed, delete it from the display.
 KEEP_COUNTDOWN: Final = 120
 
-IGNORED_COMMANDS: Set[str] = set()
+# Only ever replaced, never mutated, so the scanner thread can read it
+# without locking
+IGNORED_COMMANDS: FrozenSet[str] = frozenset()
+
+# Scratch buffer for reading /proc/PID/fdinfo/FD.  The "pos:" line we want
+# is always near the top, so this doesn't need to hold the whole file.
+FDINFO_BUF: Final = bytearray(256)
+
+# Likewise for /proc/PID/comm, which is at most 16 bytes
+COMM_BUF: Final = bytearray(64)
 
 class File:
+    __slots__ = ('name', 'basename', 'pos', 'size',
+                 'first_pos', 'first_size', 'first_timestamp',
+                 'size_text', 'size_text_of',
+                 'slot', 'expires', 'texts', 'items', 'closed_row', 'hilited')
+
     def __init__(self, name: str, pos: int, size: int, timestamp: float) -> None:
         self.name = name
+        self.basename = os.path.basename(name)
         self.pos: int | None = pos
         self.size = size
         self.first_pos = pos
         self.first_size = size
         self.first_timestamp = timestamp
-        self.table_row: int | None = None
-        self.keep_countdown = KEEP_COUNTDOWN
+        # to_si() of SIZE_TEXT_OF, usually the current size; see update_row
+        self.size_text = ''
+        self.size_text_of = -1
+        # Where the File is in ThisAppMainWindow.rows, if it has a row
+        self.slot: int | None = None
+        # The tick on which the row goes away unless updated again
+        self.expires = 0
+        # What's currently displayed in the table row, if any
+        self.texts: Tuple[str, ...] = ()
+        self.items: List[QtWidgets.QTableWidgetItem] = []
+        self.closed_row = False
+        self.hilited = False
 
     def __str__(self) -> str:
         return f'File({self.name},{self.pos},{self.size})'
 
-FdDevIno = Tuple[int, int, int]
-Files = Dict[FdDevIno, File]
 FileSet = Set[File]
 
-class Process:
-    def __init__(self, pid: int, command: str, files: Files) -> None:
-        self.pid = pid          # process identifier
-        self.command = command  # name of the process command
-        self.files = files
+# Identifies one open file of one process
+PidCommandFdDevInoName = Tuple[int, str, int, int, int, str]
+KeySet = Set[PidCommandFdDevInoName]
 
-    def __str__(self) -> str:
-        return f'Process({self.pid},{self.command})'
+# The position, size and timestamp of an open file, as seen by get_procs().
+# Only turned into a File when it's a file we haven't seen before.
+FileInfo = Tuple[int, int, float]
+Snapshot = Dict[PidCommandFdDevInoName, FileInfo]
 
-Processes = List[Process]
+# What each (pid, fd) was pointing at last time: the file's device, inode
+# and link count, and the name readlink() gave for it
+PidFd = Tuple[int, int]
+NameCache = Dict[PidFd, Tuple[int, int, int, str]]
+
+def read_comm(pid: str) -> str:
+    """
+    Returns the command name of process PID, from /proc/PID/comm.
+
+    This is a single open, read and close into COMM_BUF.  Going through
+    open() would also fstat, ioctl and lseek the file and set up a text
+    decoder, all to read a dozen bytes.
+    """
+    fd = os.open(f'{pid}/comm', os.O_RDONLY)
+    try:
+        n = os.readv(fd, [COMM_BUF])
+    finally:
+        os.close(fd)
+    return COMM_BUF[:n].decode('utf-8', 'replace').rstrip('\n')
+
+def parse_pos(buf: bytearray, n: int) -> int:
+    """
+    Returns the value of the 'pos:' line in the first N bytes of BUF, the
+    contents of a /proc/PID/fdinfo/FD file, or 0 if there is none
+    """
+    start = buf.find(b'pos:', 0, n)
+    if start == -1:
+        return 0
+    end = buf.find(b'\n', start, n)
+    return int(buf[start + 4:end if end != -1 else n])
 
-def get_procs() -> Processes:
+def get_procs(name_cache: NameCache, ignored: FrozenSet[str]) -> Snapshot:
     """
     Take a snapshot of /proc.
 
-    Returns a list of Process objects.
+    NAME_CACHE saves a readlink() for each fd still open on the same file
+    as in the last snapshot.  The link count is part of the match so that a
+    file being deleted still shows up as "(deleted)".
+
+    Processes whose command is in IGNORED are skipped before any of their
+    fds are stat'ed.
+
+    Returns the regular and block-device files open in each process.
     """
 
-    procs = []
+    snapshot: Snapshot = {}
+    names: NameCache = {}
+    # Checked once here rather than by each logging.debug() in the fd loop
+    debug = logging.getLogger().isEnabledFor(logging.DEBUG)
+    # Local names for what the fd loop calls on every iteration
+    os_open, os_readv, os_close, rdonly = os.open, os.readv, os.close, os.O_RDONLY
+    readv_bufs = [FDINFO_BUF]
     timestamp = time.time()
-    for pid in os.listdir('.'):
-        if not pid[0].isdigit():
+    for entry in os.scandir('.'):
+        # Only the numeric entries are processes
+        pid = entry.name
+        if not '0' <= pid[0] <= '9':
             continue
 
-        fddir = pid + '/fd/'
+        pid_num = int(pid)
+        # Without root, most processes' fd directories can't be read.
+        # Find that out before spending a comm read on the process.
         try:
-            fds = os.listdir(fddir)
+            with os.scandir(pid + '/fd') as fd_dir:
+                fds = list(fd_dir)
         except OSError as exc:
             logging.debug('pid %s: skip %s', pid, exc)
             continue
 
         try:
-            with open(f'{pid}/comm', encoding='utf-8') as f:
-                command = f.read().rstrip('\n')
-        except IOError as exc:
+            command = read_comm(pid)
+        except OSError as exc:
             logging.debug('pid %s: skip %s', pid, exc)
             continue
 
-        fdmap = {}
-        for fd in fds:
+        # Don't bother looking at the files of an ignored process
+        if command in ignored:
+            continue
+
+        fdinfo_dir = pid + '/fdinfo/'
+        for fd_entry in fds:
+            fd = fd_entry.name
             try:
-                fdfile = fddir + fd
-                st = os.stat(fdfile)
+                # Every entry in fd/ is a symlink, so there's no file type
+                # to go on without following it
+                st = fd_entry.stat()
 
                 if not (S_ISREG(st.st_mode) or S_ISBLK(st.st_mode)):
                     # logging.debug('pid %s, fd %s: not regular or block', pid, fd)
                     continue
 
-                name = os.readlink(fdfile)
-                logging.debug('pid %s, fd %s: name %r', pid, fd, name)
+                fd_num = int(fd)
+                fd_key = pid_num, fd_num
+                cached = name_cache.get(fd_key)
+                if cached and cached[:3] == (st.st_dev, st.st_ino, st.st_nlink):
+                    name = cached[3]
+                else:
+                    name = os.readlink(fd_entry.path)
+                names[fd_key] = st.st_dev, st.st_ino, st.st_nlink, name
+                if debug:
+                    logging.debug('pid %s, fd %s: name %r', pid, fd, name)
 
                 size = st.st_size
-                pos = 0
-                with open(f'{pid}/fdinfo/{fd}', encoding='utf-8') as f:
-                    for line in f:
-                        logging.debug('pid %s, fd %s: fdinfo: %r', pid, fd, line)
-                        if line.startswith('pos:'):
-                            pos = int(line[4:])
-                            break
-                logging.debug('pid %s, fd %s: pos %s of %s', pid, fd, pos, size)
-
-                fdmap[int(fd), st.st_dev, st.st_ino] = \
-                    File(name=name, pos=pos, size=size, timestamp=timestamp)
+                # This has to be read every time.  Nothing in st changes when
+                # a process reads through a file -- mtime only moves on
+                # writes -- so st can't tell us the position is unchanged.
+                fdinfo = os_open(fdinfo_dir + fd, rdonly)
+                try:
+                    n = os_readv(fdinfo, readv_bufs)
+                finally:
+                    os_close(fdinfo)
+                pos = parse_pos(FDINFO_BUF, n)
+                if debug:
+                    logging.debug('pid %s, fd %s: pos %s of %s', pid, fd, pos, size)
+
+                it = pid_num, command, fd_num, st.st_dev, st.st_ino, name
+                snapshot[it] = pos, size, timestamp
 
             except OSError as exc:
                 logging.debug('pid %s, fd %s: skip: %s', pid, fd, exc)
 
-        procs.append(Process(pid=int(pid), command=command, files=fdmap))
-    return procs
+    name_cache.clear()
+    name_cache.update(names)
+    return snapshot
+
+class ProcScanner(QtCore.QThread):
+    """
+    Takes a snapshot of /proc every UPDATE_MSEC and emits what changed
+    since the last one.
+
+    The scan is nothing but syscalls, so it runs on its own thread.  Most
+    files don't move between snapshots, so the scanner also does the
+    comparing and the GUI thread only has to apply the differences.
+    """
+
+    # The new and changed files, and the files that have gone away
+    changes = QtCore.pyqtSignal(dict, set)
+
+    def __init__(self) -> None:
+        super().__init__()
+        self.name_cache: NameCache = {}
+        self.last: Snapshot = {}
+        self.stopping = threading.Event()
+
+    def run(self) -> None:
+        while True:
+            logging.debug('Scan...')
+            snapshot = get_procs(self.name_cache, IGNORED_COMMANDS)
+            self.changes.emit(*self.diff(snapshot))
+            logging.debug('Scan...done')
+            if self.stopping.wait(UPDATE_MSEC / 1000):
+                break
+
+    def stop(self) -> None:
+        self.stopping.set()
+        self.wait()
+
+    def diff(self, snapshot: Snapshot) -> Tuple[Snapshot, KeySet]:
+        """
+        Compare SNAPSHOT with the previous one.
+
+        Returns the files that are new or whose position or size has
+        changed, and the keys of the files that are no longer open.
+        """
+        last = self.last
+        changed: Snapshot = {}
+        for it, info in snapshot.items():
+            prev = last.get(it)
+            if prev is None or prev[0] != info[0] or prev[1] != info[1]:
+                changed[it] = info
+        gone = last.keys() - snapshot.keys()
+        self.last = snapshot
+        return changed, gone
 
 def percentage(n: Optional[int], d: int) -> str:
     """
@@ -135,18 +282,34 @@ def percentage(n: Optional[int], d: int) -> str:
         if n == 0:
             return '0%'
         return '?'
-    p = 100.0 * n / d
-    return f'{p:.1f}%'.replace('.0', '')
+    p = f'{100.0 * n / d:.1f}'
+    if p.endswith('.0'):
+        p = p[:-2]
+    return p + '%'
 
 # ------------------------------------------------------------------------------
 
-PidCommandFdDevInoName = Tuple[int, str, int, int, int, str]
-
 class ThisAppMainWindow(QtWidgets.QMainWindow, MainWindow.Ui_MainWindow):
 
     proc_files: Dict[PidCommandFdDevInoName, File] = {}
     last_hilite: FileSet = set()
 
+    # The files in proc_files that have closed but whose row is still shown
+    closed_keys: KeySet = set()
+
+    # The files that currently have a table row, from the bottom of the
+    # table up: rows[-1] is shown in row 0.  New rows go in at the top of the
+    # table, so adding one is an append that leaves every other File's slot
+    # alone.  Usually a small subset of proc_files, and all that the per-row
+    # bookkeeping needs to look at.
+    rows: List[File] = []
+
+    # Number of snapshots applied so far, and which displayed files are due
+    # to expire on which tick.  Each file is in at most one bucket, so a
+    # tick only has to look at the rows actually expiring on it.
+    ticks = 0
+    expiring: Dict[int, FileSet] = {}
+
     def __init__(self) -> None:
         QtWidgets.QMainWindow.__init__(self)
         MainWindow.Ui_MainWindow.__init__(self)
@@ -161,7 +324,7 @@ class ThisAppMainWindow(QtWidgets.QMainWindow, MainWindow.Ui_MainWindow):
         tab.setContextMenuPolicy(Qt.CustomContextMenu)
         tab.customContextMenuRequested.connect(self.show_table_context_menu)
 
-        self.pushButton_quit.clicked.connect(sys.exit)
+        self.pushButton_quit.clicked.connect(QtWidgets.QApplication.quit)
 
         tab.setRowCount(0)
 
@@ -200,11 +363,13 @@ class ThisAppMainWindow(QtWidgets.QMainWindow, MainWindow.Ui_MainWindow):
         h.setSectionResizeMode(col, QtWidgets.QHeaderView.Stretch)
         col += 1
 
-        self.update_table()
-
-        self.timer = QtCore.QTimer()
-        self.timer.timeout.connect(self.tick)
-        self.timer.start(UPDATE_MSEC)
+        # The scanner thread must be stopped before the app is torn down
+        self.scanner = ProcScanner()
+        self.scanner.changes.connect(self.tick)
+        app = QtWidgets.QApplication.instance()
+        assert app
+        app.aboutToQuit.connect(self.scanner.stop)
+        self.scanner.start()
 
         self.set_hide_button()
         self.set_unignore_button()
@@ -220,13 +385,10 @@ class ThisAppMainWindow(QtWidgets.QMainWindow, MainWindow.Ui_MainWindow):
         column = item.column()
         logging.debug('at %s,%s', row, column)
 
-        for it, proc_file in self.proc_files.items():
-            if row == proc_file.table_row:
-                command = it[1]
-                break
-        else:
+        if not 0 <= row < len(self.rows):
             print('No row', row, flush=True, file=sys.stderr)
             return
+        command = self.rows[-1 - row].texts[COL_COMMAND]
 
         menu = QtWidgets.QMenu()
 
@@ -248,58 +410,27 @@ class ThisAppMainWindow(QtWidgets.QMainWindow, MainWindow.Ui_MainWindow):
         else:
             logging.debug('unhandled key event %r %r', mods, key)
 
-    def update_row(self, pid: int, command: str, fd: int, proc_file: File) -> None:
-        now = time.time()
+    def update_row(self, pid: int, command: str, fd: int, proc_file: File,
+                   now: float, when: str) -> None:
+        """
+        Show PROC_FILE's current state in its table row, adding the row if
+        needed.  NOW is the time of the update and WHEN is NOW formatted for
+        display, shared by every row updated in the same tick.
+        """
         tab = self.mainTable
-        proc_file.keep_countdown = KEEP_COUNTDOWN
-
-        row = proc_file.table_row
-        if row is None:
-            # Add the file to the table -- insert at top
-            row = 0
-            tab.insertRow(row)
-            for pf in self.proc_files.values():
-                if pf.table_row is not None:
-                    pf.table_row += 1
-            proc_file.table_row = row
-
-        col = 0
+        bucket = self.expiring.get(proc_file.expires)
+        if bucket:
+            bucket.discard(proc_file)
+        proc_file.expires = self.ticks + KEEP_COUNTDOWN - 1
+        self.expiring.setdefault(proc_file.expires, set()).add(proc_file)
 
         closed = proc_file.pos is None
 
-        # when
-        i = Item(time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(now)))
-        i.setTextAlignment(int(Qt.AlignCenter))
-        if closed:
-            i.setForeground(GREY)
-        tab.setItem(row, col, i)
-        col += 1
-
-        # position%
-        i = Item('-' if closed
-                 else percentage(proc_file.pos, proc_file.size))
-        i.setTextAlignment(int(Qt.AlignCenter))
-        if closed:
-            i.setForeground(GREY)
-        tab.setItem(row, col, i)
-        col += 1
-
-        # position
-        i = Item('-' if closed or proc_file.pos is None
-                 else to_si(proc_file.pos))
-        i.setTextAlignment(int(Qt.AlignCenter))
-        if closed:
-            i.setForeground(GREY)
-        tab.setItem(row, col, i)
-        col += 1
-
-        # size
-        i = Item(to_si(proc_file.size))
-        i.setTextAlignment(int(Qt.AlignCenter))
-        if closed:
-            i.setForeground(GREY)
-        tab.setItem(row, col, i)
-        col += 1
+        # The size mostly stays put while the position moves, so only
+        # reformat it when it changes
+        if proc_file.size_text_of != proc_file.size:
+            proc_file.size_text = to_si(proc_file.size)
+            proc_file.size_text_of = proc_file.size
 
         # rate, remaining
         rate = '-'
@@ -315,130 +446,217 @@ class ThisAppMainWindow(QtWidgets.QMainWindow, MainWindow.Ui_MainWindow):
                         s = int(more_bytes / bytes_per_sec)
                         more_time = f'{s // 60:d}:{s % 60:02d}'
 
-        i = Item(rate)
-        i.setTextAlignment(int(Qt.AlignCenter))
-        if closed:
-            i.setForeground(GREY)
-        tab.setItem(row, col, i)
-        col += 1
-
-        i = Item(more_time)
-        i.setTextAlignment(int(Qt.AlignCenter))
-        if closed:
-            i.setForeground(GREY)
-        tab.setItem(row, col, i)
-        col += 1
-
-        # command
-        i = Item(command)
-        i.setTextAlignment(int(Qt.AlignCenter))
-        i.setToolTip(f'PID {pid}')
-        if closed:
-            i.setForeground(GREY)
-        tab.setItem(row, col, i)
-        col += 1
+        texts = (
+            when,
+            # position%
+            '-' if closed else percentage(proc_file.pos, proc_file.size),
+            # position
+            '-' if closed or proc_file.pos is None else to_si(proc_file.pos),
+            # size
+            proc_file.size_text,
+            rate,
+            more_time,
+            command,
+            # file name
+            proc_file.basename,
+        )
+
+        if proc_file.slot is None:
+            # Add the file to the table -- insert at top
+            row = 0
+            tab.insertRow(row)
+            proc_file.slot = len(self.rows)
+            self.rows.append(proc_file)
+            self.populate_row(row, pid, fd, proc_file, texts, closed)
+        else:
+            self.refresh_row(proc_file, texts, closed)
 
-        # file name
-        i = Item(os.path.basename(proc_file.name))
-        i.setToolTip(f'{fd} -> {proc_file.name}')
-        i.setTextAlignment(int(Qt.AlignLeft | Qt.AlignVCenter))
-        if closed:
-            i.setForeground(GREY)
-        tab.setItem(row, col, i)
-        col += 1
+        proc_file.texts = texts
+        proc_file.closed_row = closed
 
-    def update_table(self) -> None:
-        closed = set(self.proc_files.keys())
+    def populate_row(self, row: int, pid: int, fd: int, proc_file: File,
+                     texts: Tuple[str, ...], closed: bool) -> None:
+        """
+        Fill in a newly inserted table row.  This is the only place that
+        allocates table items; after this the row's items are reused.
+        """
+        tab = self.mainTable
+        items = [Item(text) for text in texts]
+        items[COL_COMMAND].setToolTip(f'PID {pid}')
+        items[COL_FILE_NAME].setToolTip(f'{fd} -> {proc_file.name}')
+        for col, (i, alignment) in enumerate(zip(items, COLUMN_ALIGNMENT)):
+            i.setTextAlignment(alignment)
+            if closed:
+                i.setForeground(GREY)
+            tab.setItem(row, col, i)
+        proc_file.items = items
+        proc_file.hilited = False
+
+    def refresh_row(self, proc_file: File,
+                    texts: Tuple[str, ...], closed: bool) -> None:
+        """
+        Update the items already in PROC_FILE's row in place, touching only
+        the cells whose text has changed since last time
+        """
+        recolor = closed != proc_file.closed_row
+        for i, text, last in zip(proc_file.items, texts, proc_file.texts):
+            if text == last and not recolor:
+                continue
+            if text != last:
+                i.setText(text)
+            if recolor:
+                if closed:
+                    i.setForeground(GREY)
+                else:
+                    i.setData(Qt.ForegroundRole, None)
+
+    def update_table(self, changed: Snapshot, gone: KeySet) -> None:
+        """
+        Apply the latest differences from the scanner: CHANGED has the new
+        files and those whose position or size moved, GONE the keys of the
+        files no longer open
+        """
+        self.ticks += 1
         hilite: FileSet = set()
 
-        for proc in get_procs():
-            if proc.command in IGNORED_COMMANDS:
+        now = time.time()
+        when = time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(now))
+        ignored = IGNORED_COMMANDS
+        # Local names for what the loops below use on every iteration
+        proc_files = self.proc_files
+        closed_keys = self.closed_keys
+        update_row = self.update_row
+        hilite_add = hilite.add
+
+        for it, (pos, size, timestamp) in changed.items():
+            pid, command, fd, _dev, _ino, name = it
+            # A snapshot taken just before a command was ignored still has it
+            if command in ignored:
+                continue
+            closed_keys.discard(it)
+
+            proc_file = proc_files.get(it)
+            if not proc_file:
+                # New file. Add it to proc_files, but we won't add it to
+                # the table yet -- wait until the position changes.
+                proc_files[it] = File(name=name, pos=pos, size=size,
+                                      timestamp=timestamp)
                 continue
 
-            for (fd, dev, ino), new_proc_file in proc.files.items():
-                it = proc.pid, proc.command, fd, dev, ino, new_proc_file.name
-                closed.discard(it)
-
-                proc_file = self.proc_files.get(it)
-                if not proc_file:
-                    # New file. Add it to proc_files, but we won't add it to
-                    # the table yet -- wait until the position changes.
-                    self.proc_files[it] = new_proc_file
-                    continue
+            if proc_file.pos == pos and proc_file.size == size:
+                continue
 
-                if proc_file.pos == new_proc_file.pos and \
-                   proc_file.size == new_proc_file.size:
-                    continue
+            proc_file.pos = pos
+            proc_file.size = size
 
-                proc_file.pos = new_proc_file.pos
-                proc_file.size = new_proc_file.size
+            update_row(pid, command, fd, proc_file, now, when)
+            hilite_add(proc_file)
 
-                self.update_row(proc.pid, proc.command, fd, proc_file)
-                hilite.add(proc_file)
+        # Closed files are only kept while they still have a row
+        for it in [it for it in closed_keys if proc_files[it].slot is None]:
+            closed_keys.discard(it)
+            del proc_files[it]
 
         # Check for files that are now gone (closed)
-        for it in closed:
-            proc_file = self.proc_files[it]
-            if proc_file.table_row is None:
-                del self.proc_files[it]
+        for it in gone:
+            proc_file = proc_files.get(it)
+            if proc_file is None:
                 continue
-            if proc_file.pos is None:
+            if proc_file.slot is None:
+                del proc_files[it]
                 continue
             logging.debug('closed: %s %s', it, proc_file)
             proc_file.pos = None
-            pid, command, fd, dev, ino, _file_name = it
-            self.update_row(pid, command, fd, proc_file)
-            hilite.add(proc_file)
-
-        # Decrement keep_count for each row and delete the row if the count
-        # reaches zero.  Don't delete the proc_files entry, though; if later
-        # there's new activity on this proc_file, we'll re-add the row and
-        # pick up where we left off.
-        for proc_file in self.proc_files.values():
-            row = proc_file.table_row
-            if row is None:
-                continue
-            proc_file.keep_countdown -= 1
-            logging.debug('countdown %s, row %s, file %s',
-                          proc_file.keep_countdown,
-                          proc_file.table_row,
+            closed_keys.add(it)
+            pid, command, fd, _dev, _ino, _file_name = it
+            update_row(pid, command, fd, proc_file, now, when)
+            hilite_add(proc_file)
+
+        # Delete the rows that haven't been updated for KEEP_COUNTDOWN ticks.
+        # Don't delete the proc_files entry, though; if later there's new
+        # activity on this proc_file, we'll re-add the row and pick up where
+        # we left off.
+        for proc_file in self.expiring.pop(self.ticks, set()):
+            logging.debug('expired row %s, file %s',
+                          self.table_row(proc_file),
                           proc_file.name)
-            if proc_file.keep_countdown > 0:
-                continue
-            proc_file.table_row = None
-            self.remove_row(row)
+            if proc_file.slot is not None:
+                self.remove_row(proc_file)
 
         # Adjust the row hilighting
-        for proc_file in self.last_hilite - hilite:
-            self.hilite_row(proc_file.table_row, False)
-        for proc_file in hilite:
-            self.hilite_row(proc_file.table_row, True)
+        self.hilite_rows(self.last_hilite - hilite, False)
+        self.hilite_rows(hilite, True)
         self.last_hilite = hilite
 
         self.set_hide_button()
 
-    def remove_row(self, row: int) -> None:
+    def table_row(self, proc_file: File) -> Optional[int]:
+        """
+        Returns the table row showing PROC_FILE, or None if it has none
+        """
+        if proc_file.slot is None:
+            return None
+        return len(self.rows) - 1 - proc_file.slot
+
+    def remove_row(self, proc_file: File) -> None:
+        row = self.table_row(proc_file)
+        slot = proc_file.slot
+        assert row is not None and slot is not None
+        proc_file.slot = None
+        proc_file.items = []    # about to be deleted along with the row
         self.mainTable.removeRow(row)
-        # Adjust table_row for all rows after this one
-        for pf in self.proc_files.values():
-            if pf.table_row is not None and pf.table_row > row:
-                pf.table_row -= 1
+        rows = self.rows
+        del rows[slot]
+        # Only the rows above this one (added after it) change slot
+        for slot in range(slot, len(rows)):
+            rows[slot].slot = slot
 
-    def hilite_row(self, row: Optional[int], hilite: bool) -> None:
-        if row is None:
+    def hilite_rows(self, proc_files: FileSet, hilite: bool) -> None:
+        """
+        Set the background of the rows showing PROC_FILES, skipping the
+        rows that already have it.
+
+        Each setBackground() would normally make the model emit its own
+        dataChanged, so hold those back and emit one covering all the rows.
+        """
+        changing: List[File] = []
+        rows: List[int] = []
+        for pf in proc_files:
+            row = self.table_row(pf)
+            if row is not None and pf.hilited != hilite:
+                changing.append(pf)
+                rows.append(row)
+        if not rows:
             return
         tab = self.mainTable
+        model = tab.model()
+        cols = tab.columnCount()
         color = YELLOW if hilite else WHITE
-        for col in range(tab.columnCount()):
-            i = tab.item(row, col)
-            if not i:
-                print('No cell at', row, col, flush=True, file=sys.stderr)
-                continue
-            i.setBackground(color)
-
-    def tick(self) -> None:
+        model.blockSignals(True)
+        try:
+            for pf in changing:
+                pf.hilited = hilite
+                for i in pf.items:
+                    i.setBackground(color)
+        finally:
+            model.blockSignals(False)
+        model.dataChanged.emit(model.index(min(rows), 0),
+                               model.index(max(rows), cols - 1),
+                               [Qt.BackgroundRole])
+
+    def tick(self, changed: Snapshot, gone: KeySet) -> None:
         logging.debug('Tick...')
-        self.update_table()
+        # Hold off repainting (and re-sorting, should sorting ever be turned
+        # on) until the whole snapshot has been applied
+        tab = self.mainTable
+        sorting = tab.isSortingEnabled()
+        tab.setSortingEnabled(False)
+        tab.setUpdatesEnabled(False)
+        try:
+            self.update_table(changed, gone)
+        finally:
+            tab.setUpdatesEnabled(True)
+            tab.setSortingEnabled(sorting)
         logging.debug('Tick...done')
 
     def hide_all_rows(self) -> None:
@@ -447,27 +665,28 @@ class ThisAppMainWindow(QtWidgets.QMainWindow, MainWindow.Ui_MainWindow):
         """
         self.mainTable.setRowCount(0)
         self.last_hilite = set()
-        for proc_file in self.proc_files.values():
-            proc_file.table_row = None
+        for proc_file in self.rows:
+            proc_file.slot = None
+            proc_file.items = []
+        self.rows = []
         self.set_hide_button()
 
     def ignore_command(self, command_to_ignore: str) -> None:
-        IGNORED_COMMANDS.add(command_to_ignore)
+        global IGNORED_COMMANDS
+        IGNORED_COMMANDS |= {command_to_ignore}
         for it, proc_file in self.proc_files.items():
-            if proc_file.table_row is None:
+            if proc_file.slot is None:
                 continue
             _pid, command, _fd, _dev, _info, _name = it
             if command != command_to_ignore:
                 continue
 
-            row = proc_file.table_row
-            proc_file.table_row = None
-            self.remove_row(row)
+            self.remove_row(proc_file)
         self.set_unignore_button()
 
     def unignore(self) -> None:
         global IGNORED_COMMANDS
-        IGNORED_COMMANDS = set()
+        IGNORED_COMMANDS = frozenset()
         self.set_unignore_button()
 
     def set_hide_button(self) -> None:
@@ -497,8 +716,10 @@ def main(ignore: Tuple[str, ...],
                         format=f'{os.path.basename(__file__)}: [%(levelname).1s] %(message)s')
 
     global IGNORED_COMMANDS
-    if ignore:
-        IGNORED_COMMANDS = set(','.join(ignore).split(','))
+    IGNORED_COMMANDS = frozenset(command
+                                 for arg in ignore
+                                 for command in arg.split(',')
+                                 if command)
 
     os.chdir('/proc')
 